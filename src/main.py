@@ -8,10 +8,34 @@ a single quantum query, demonstrating exponential speedup over classical algorit
 
 import pennylane as qml
 import numpy as np
-import matplotlib.pyplot as plt
+from functools import lru_cache
 from typing import Callable, List
 
 
+# Each oracle's gate list is materialized once per n_qubits and re-applied
+# on every call via qml.apply, so repeated circuit constructions reuse the
+# same Operation instances instead of re-allocating them gate by gate
+
+@lru_cache(maxsize=None)
+def _constant_1_ops(n_qubits: int):
+    # stop_recording keeps construction out of any active queuing context,
+    # so the ops are only queued when qml.apply replays them
+    with qml.QueuingManager.stop_recording():
+        return (qml.PauliX(n_qubits),)
+
+
+@lru_cache(maxsize=None)
+def _parity_ops(n_qubits: int):
+    with qml.QueuingManager.stop_recording():
+        return tuple(qml.CNOT(wires=[i, n_qubits]) for i in range(n_qubits))
+
+
+@lru_cache(maxsize=None)
+def _first_half_ops(n_qubits: int):
+    with qml.QueuingManager.stop_recording():
+        return (qml.CNOT(wires=[0, n_qubits]),)
+
+
 def constant_oracle_0(n_qubits: int):
     # Constant function: f(x) = 0 for all x
     # No operations needed - identity
@@ -21,111 +45,209 @@ def constant_oracle_0(n_qubits: int):
 def constant_oracle_1(n_qubits: int):
     # Constant function: f(x) = 1 for all x
     # Apply X gate to ancilla qubit (flips |0⟩ to |1⟩)
-    qml.PauliX(n_qubits)
+    for op in _constant_1_ops(n_qubits):
+        qml.apply(op)
 
 
 def balanced_oracle_parity(n_qubits: int):
     # Balanced function: XOR of all input bits
     # Apply CNOT gates from each input qubit to ancilla
-    for i in range(n_qubits):
-        qml.CNOT(wires=[i, n_qubits])
+    for op in _parity_ops(n_qubits):
+        qml.apply(op)
 
 
 def balanced_oracle_first_half(n_qubits: int):
     # Balanced function: return 1 if most significant bit is 0
     # Apply CNOT from MSB to ancilla
-    qml.CNOT(wires=[0, n_qubits])
+    for op in _first_half_ops(n_qubits):
+        qml.apply(op)
+
+
+# Registry of known oracles, keyed by name so qnodes can be cached on a
+# hashable key instead of the oracle callable itself
+ORACLES = {
+    'constant_0': constant_oracle_0,
+    'constant_1': constant_oracle_1,
+    'balanced_parity': balanced_oracle_parity,
+    'balanced_first_half': balanced_oracle_first_half,
+}
+
+_ORACLE_KEYS = {oracle: key for key, oracle in ORACLES.items()}
+
+
+def _hadamard_layer(n_wires: int):
+    # Queue a Hadamard on every wire (qml.broadcast was removed in
+    # PennyLane 0.40; an explicit loop is its replacement)
+    for i in range(n_wires):
+        qml.Hadamard(wires=i)
+
+
+def _dj_gates(n_qubits: int, oracle: Callable):
+    # The Deutsch-Jozsa gate sequence, shared by every circuit builder
+    # Step 1: Initialize ancilla qubit to |1⟩
+    qml.PauliX(n_qubits)
+
+    # Step 2: Apply Hadamard gates to all qubits
+    _hadamard_layer(n_qubits + 1)
+
+    # Step 3: Apply oracle
+    oracle(n_qubits)
+
+    # Step 4: Apply Hadamard gates to input qubits
+    _hadamard_layer(n_qubits)
+
+
+# Dispatcher cache for deutsch_jozsa_circuit: one qnode per
+# (n_qubits, oracle), built on first request and reused afterwards
+# (the probability/decision path has its own cache in _make_dj_qnode)
+_CIRCUIT_CACHE = {}
 
 
 def deutsch_jozsa_circuit(n_qubits: int, oracle: Callable):
-    dev = qml.device('default.qubit', wires=n_qubits + 1)
-    
+    key = (n_qubits, oracle)
+    if key in _CIRCUIT_CACHE:
+        return _CIRCUIT_CACHE[key]
+
+    dev = qml.device('lightning.qubit', wires=n_qubits + 1)
+
     @qml.qnode(dev)
     def circuit():
-        # Step 1: Initialize ancilla qubit to |1⟩
-        qml.PauliX(n_qubits)
-        
-        # Step 2: Apply Hadamard gates to all qubits
-        for i in range(n_qubits + 1):
-            qml.Hadamard(wires=i)
-        
-        # Step 3: Apply oracle
-        oracle(n_qubits)
-        
-        # Step 4: Apply Hadamard gates to input qubits
-        for i in range(n_qubits):
-            qml.Hadamard(wires=i)
-        
-        # Step 5: Measure input qubits
-        return [qml.sample(qml.PauliZ(i)) for i in range(n_qubits)]
-    
+        _dj_gates(n_qubits, oracle)
+
+        # Measure input qubits in one multi-wire sample; the device
+        # returns a (shots, n_qubits) 0/1 array instead of n separate
+        # per-observable sample arrays
+        return qml.sample(wires=range(n_qubits))
+
+    _CIRCUIT_CACHE[key] = circuit
     return circuit
 
 
-def deutsch_jozsa_probability(n_qubits: int, oracle: Callable, shots: int = 1000):
-    dev = qml.device('default.qubit', wires=n_qubits + 1, shots=shots)
-    
-    @qml.qnode(dev)
+@lru_cache(maxsize=None)
+def _make_dj_qnode(n_qubits: int, shots: int | None, oracle_key: str):
+    # Build device and qnode once per (n_qubits, shots, oracle); repeated
+    # calls with the same configuration reuse the compiled qnode instead of
+    # paying tape-construction overhead again. qml.qjit (Catalyst) lowers
+    # the circuit to a native binary on first call, so later calls skip
+    # Python tracing entirely; n_qubits and the oracle are baked in as
+    # compile-time constants.
+    oracle = ORACLES[oracle_key]
+    dev = qml.device('lightning.qubit', wires=n_qubits + 1, shots=shots)
+
+    # Tape-level caching is off since we reuse the qnode object itself
+    @qml.qjit
+    @qml.qnode(dev, cache=False)
     def circuit():
-        # Initialize ancilla
-        qml.PauliX(n_qubits)
-        
-        # Hadamard on all qubits
-        for i in range(n_qubits + 1):
-            qml.Hadamard(wires=i)
-        
-        # Oracle
-        oracle(n_qubits)
-        
-        # Hadamard on input qubits
-        for i in range(n_qubits):
-            qml.Hadamard(wires=i)
-        
-        # Measure input qubits
-        return [qml.sample(qml.PauliZ(i)) for i in range(n_qubits)]
-    
-    # Execute circuit
+        _dj_gates(n_qubits, oracle)
+
+        # Measure input qubits: exact probabilities on an analytic device
+        # (shots=None), otherwise 0/1 computational-basis samples of shape
+        # (shots, n) — Catalyst only compiles wire-based sampling
+        if shots is None:
+            return qml.probs(wires=range(n_qubits))
+        return qml.sample(wires=range(n_qubits))
+
+    return circuit
+
+
+@lru_cache(maxsize=None)
+def _bit_labels(n_qubits: int):
+    # Bitstring labels indexed by integer code, formatted once per
+    # n_qubits and shared by every site that needs string keys
+    return tuple(format(i, f'0{n_qubits}b') for i in range(1 << n_qubits))
+
+
+def deutsch_jozsa_probability(n_qubits: int, oracle: Callable) -> np.ndarray:
+    # Analytic path: the simulator emits the exact length-2^n distribution
+    # directly, with no shot sampling or histogram post-processing at all.
+    # The dense array is indexed by integer bitstring, so consumers read
+    # probs[0] for |0...0> instead of hashing string keys; labels are only
+    # formatted when pretty-printing (via _bit_labels)
+    circuit = _make_dj_qnode(n_qubits, None, _ORACLE_KEYS[oracle])
+    return np.asarray(circuit())
+
+
+def deutsch_jozsa_batch(n_qubits: int, oracles: List[Callable]):
+    # Run every oracle's circuit in one qml.execute call on a shared
+    # device, so device setup and state-vector allocation are amortized
+    # across the batch instead of paid per oracle
+    dev = qml.device('lightning.qubit', wires=n_qubits + 1)
+
+    tapes = []
+    for oracle in oracles:
+        with qml.tape.QuantumTape() as tape:
+            _dj_gates(n_qubits, oracle)
+            qml.probs(wires=range(n_qubits))
+        tapes.append(tape)
+
+    return [np.asarray(probs) for probs in qml.execute(tapes, dev, diff_method=None)]
+
+
+def deutsch_jozsa_decide(n_qubits: int, oracle: Callable) -> float:
+    # The constant/balanced decision only needs the |0...0> probability,
+    # which is exactly 1 or 0 — read it straight off the analytic
+    # distribution instead of estimating it from shots
+    circuit = _make_dj_qnode(n_qubits, None, _ORACLE_KEYS[oracle])
+    return float(circuit()[0])
+
+
+def _histogram_samples(bits: np.ndarray, n_qubits: int) -> np.ndarray:
+    # Aggregation kernel for the sampling path: pack each (shots, n) 0/1
+    # row into an integer code, then bincount over the 2^n code range.
+    # Both steps run inside NumPy's compiled loops, so no per-shot Python
+    # work remains
+    weights = 1 << np.arange(n_qubits - 1, -1, -1)
+    return np.bincount(bits @ weights, minlength=1 << n_qubits)
+
+
+def deutsch_jozsa_decide_sampled(n_qubits: int, oracle: Callable,
+                                 shots_schedule=(32, 128, 1024)) -> float:
+    # Shot-based variant of deutsch_jozsa_decide with an adaptive budget:
+    # Deutsch-Jozsa is deterministic on a noiseless simulator, so the
+    # smallest tier almost always settles the decision. Escalate only
+    # while the 95% Wald interval around p(|0...0>) still straddles 0.5.
+    oracle_key = _ORACLE_KEYS[oracle]
+    for shots in shots_schedule:
+        samples = np.asarray(_make_dj_qnode(n_qubits, shots, oracle_key)())
+        p0 = float(np.mean(~samples.any(axis=1)))
+        half_width = 1.96 * np.sqrt(p0 * (1 - p0) / shots)
+        if p0 - half_width > 0.5 or p0 + half_width < 0.5:
+            break
+    return p0
+
+
+def deutsch_jozsa_sample_probability(n_qubits: int, oracle: Callable, shots: int = 1000) -> np.ndarray:
+    # Sampling path, kept for shot-based histogram demonstrations
+    circuit = _make_dj_qnode(n_qubits, shots, _ORACLE_KEYS[oracle])
+
+    # Execute circuit; results has shape (shots, n_qubits) with 0/1 entries
     results = circuit()
-    
-    # Process results: convert to bitstrings
-    # PauliZ measurement returns +1 for |0⟩ and -1 for |1⟩
-    # Convert to 0 and 1
-    bitstrings = []
-    for i in range(shots):
-        bitstring = ''.join(['0' if r[i] == 1 else '1' for r in results])
-        bitstrings.append(bitstring)
-    
-    # Count occurrences
-    counts = {}
-    for bitstring in bitstrings:
-        counts[bitstring] = counts.get(bitstring, 0) + 1
-    
-    # Convert to probabilities
-    probabilities = {k: v / shots for k, v in counts.items()}
-    
-    return probabilities
 
+    # Histogram the samples in one vectorized kernel and normalize; like
+    # the analytic path, the result is a dense length-2^n array indexed by
+    # integer bitstring
+    counts = _histogram_samples(np.asarray(results, dtype=np.uint8), n_qubits)
+    return counts / shots
 
+
+@lru_cache(maxsize=None)
 def classical_algorithm(function_type: str, n_qubits: int):
-    total_inputs = 2 ** n_qubits
-    
     if function_type == 'constant':
         # For constant function, need to check 2 inputs to be sure
         return 2
     else:
         # For balanced function, worst case need 2^(n-1) + 1 queries
-        return 2 ** (n_qubits - 1) + 1
+        return (1 << (n_qubits - 1)) + 1
 
 
 def test_deutsch_jozsa():
     n_qubits = 3
-    shots = 1000
-    
+
     print("=" * 70)
     print("Deutsch-Jozsa Algorithm Demonstration")
     print("=" * 70)
     print(f"Number of input qubits: {n_qubits}")
-    print(f"Measurement shots: {shots}")
+    print("Measurement: analytic (exact probabilities, no shots)")
     print()
     
     test_cases = [
@@ -136,18 +258,19 @@ def test_deutsch_jozsa():
     ]
     
     results = []
-    
-    for name, oracle, function_type in test_cases:
+
+    # Execute all four oracle circuits in one batched device call
+    all_probs = deutsch_jozsa_batch(n_qubits, [oracle for _, oracle, _ in test_cases])
+
+    for (name, oracle, function_type), probs in zip(test_cases, all_probs):
         print("-" * 70)
         print(f"Testing: {name}")
         print("-" * 70)
-        
-        # Run quantum algorithm
-        probabilities = deutsch_jozsa_probability(n_qubits, oracle, shots)
-        
-        # Check if all-zero state has high probability (constant) or low (balanced)
-        zero_state = '0' * n_qubits
-        zero_prob = probabilities.get(zero_state, 0.0)
+
+        # Classify from the zero-state probability alone (constant if high,
+        # balanced if low) — an O(1) index into the dense distribution
+        zero_prob = float(probs[0])
+        probabilities = probs
         
         # Determine result
         if zero_prob > 0.9:
@@ -163,9 +286,9 @@ def test_deutsch_jozsa():
         print()
         
         print("Measurement probabilities (top 5):")
-        sorted_probs = sorted(probabilities.items(), key=lambda x: x[1], reverse=True)
-        for bitstring, prob in sorted_probs[:5]:
-            print(f"  |{bitstring}⟩: {prob:.4f}")
+        labels = _bit_labels(n_qubits)
+        for i in np.argsort(probabilities)[::-1][:5]:
+            print(f"  |{labels[i]}⟩: {probabilities[i]:.4f}")
         print()
         
         # Classical comparison
@@ -187,37 +310,58 @@ def test_deutsch_jozsa():
     return results
 
 
+# Figure and axes grid reused by visualize_results; building matplotlib
+# figure state is expensive, so repeated runs clear and redraw the same
+# axes instead of allocating a new figure each time
+_dj_figure = None
+
+
 def visualize_results(results: List[dict], n_qubits: int):
+    global _dj_figure
+
+    # matplotlib is only needed here, so defer the (expensive) import until
+    # a visualization is actually requested; the non-interactive Agg
+    # backend renders straight to the PNG without touching any GUI toolkit
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
     import os
     os.makedirs('data', exist_ok=True)
-    
-    fig, axes = plt.subplots(2, 2, figsize=(14, 10))
+
+    # Every subplot shares the fixed label axis, so outcomes with zero
+    # probability plot as empty bars instead of being dropped (and no
+    # per-subplot sorting is needed)
+    bitstrings = _bit_labels(n_qubits)
+    positions = range(len(bitstrings))
+
+    if _dj_figure is None:
+        _dj_figure = plt.subplots(2, 2, figsize=(14, 10))
+    fig, axes = _dj_figure
     axes = axes.flatten()
-    
+
     for idx, result in enumerate(results):
         ax = axes[idx]
-        probs = result['probabilities']
-        
-        # Sort by bitstring value
-        sorted_items = sorted(probs.items(), key=lambda x: int(x[0], 2))
-        bitstrings = [item[0] for item in sorted_items]
-        probabilities = [item[1] for item in sorted_items]
-        
-        ax.bar(range(len(bitstrings)), probabilities, alpha=0.7)
+        ax.clear()
+        # The dense probability array is already aligned with the label axis
+        probabilities = result['probabilities']
+
+        # Rasterized bars encode faster when the figure is written out
+        ax.bar(positions, probabilities, alpha=0.7, rasterized=True)
         ax.set_xlabel('Bitstring')
         ax.set_ylabel('Probability')
         ax.set_title(f"{result['name']}\nResult: {result['result']}")
-        ax.set_xticks(range(len(bitstrings)))
+        ax.set_xticks(positions)
         ax.set_xticklabels(bitstrings, rotation=45, ha='right')
         ax.grid(True, alpha=0.3)
-        
-        # Highlight the all-zero state
-        zero_idx = bitstrings.index('0' * n_qubits)
-        ax.bar(zero_idx, probabilities[zero_idx], color='red', alpha=0.8, label='|0⟩^n')
+
+        # Highlight the all-zero state (always index 0 on the fixed axis)
+        ax.bar(0, probabilities[0], color='red', alpha=0.8, label='|0⟩^n',
+               rasterized=True)
         ax.legend()
     
-    plt.tight_layout()
-    plt.savefig('data/deutsch_jozsa_results.png', dpi=150, bbox_inches='tight')
+    fig.tight_layout()
+    fig.savefig('data/deutsch_jozsa_results.png', dpi=150, bbox_inches='tight')
     print("Saved visualization: data/deutsch_jozsa_results.png")
 
 